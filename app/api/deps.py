@@ -1,13 +1,28 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from app.core.config import settings
+from app.domains.user.models import UserOut
 from app.domains.user.service import fetch_user
+from typing import Optional
 from uuid import UUID
 
 security = HTTPBearer()
 
 
+async def authenticate_token(token: str) -> Optional[UserOut]:
+    """Resolve a bearer token to its user, or None if it is invalid."""
+    try:
+        payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
+        user_id = payload.get("sub")
+        if user_id is None:
+            return None
+        # fetch_user already returns a UserOut model
+        return await fetch_user(UUID(user_id))
+    except (JWTError, ValueError):
+        return None
+
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
 ):
@@ -16,18 +31,28 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            credentials.credentials, settings.jwt_secret, algorithms=["HS256"]
-        )
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = await fetch_user(UUID(user_id))
+    user = await authenticate_token(credentials.credentials)
     if user is None:
         raise credentials_exception
-    # fetch_user already returns a UserOut model
     return user
+
+
+def is_admin(user: UserOut) -> bool:
+    return user.email in settings.admin_emails
+
+
+async def get_current_admin(current_user: UserOut = Depends(get_current_user)):
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Admin privileges required"
+        )
+    return current_user
+
+
+async def is_admin_request(request: Request) -> bool:
+    """Check the request's bearer token outside of dependency injection (middleware)."""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    user = await authenticate_token(token)
+    return user is not None and is_admin(user)
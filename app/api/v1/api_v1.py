@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 from app.api.v1.routers import user_router
 from app.api.v1.routers import file_router
+from app.api.v1.routers import job_router
 
 api_router = APIRouter()
 api_router.include_router(user_router.router, prefix="/users", tags=["Users"])
 api_router.include_router(file_router.router, prefix="/files", tags=["Files"])
+api_router.include_router(job_router.router, prefix="/jobs", tags=["Jobs"])
 
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from app.api.deps import get_current_admin
+from app.core.profiling import ProfilerBusyError, sample_stacks
+
+router = APIRouter(tags=["Admin"], dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/profile/sample", response_class=PlainTextResponse)
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, le=120),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+):
+    """Sample all threads' stacks for a while and return flame-graph folded stacks."""
+    try:
+        folded, samples = await sample_stacks(seconds, interval_ms / 1000)
+    except ProfilerBusyError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A sampling session is already running",
+        )
+    return PlainTextResponse(folded, headers={"X-Profile-Samples": str(samples)})
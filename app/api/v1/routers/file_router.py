@@ -1,29 +1,134 @@
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from app.core.minio_client import minio_client
+from fastapi import APIRouter, File, UploadFile, HTTPException, Header, status
+from fastapi.responses import JSONResponse
+from app.core.idempotency import (
+    IDEMPOTENCY_HEADER,
+    idempotent_response,
+    request_fingerprint,
+)
+from app.core.minio_client import upload_fileobj
 from app.core.config import settings
+from app.core.logger import get_logger
+from app.domains.file.service import schedule_post_upload
+from typing import Any, Dict, List, Optional
+import asyncio
+import hashlib
+import os
 import uuid
-import io
+
+logger = get_logger("file_router")
 
 router = APIRouter()
 
-@router.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _upload_size(file: UploadFile) -> int:
+    """Size of the spooled upload, without reading it into memory."""
+    if file.size is not None:
+        return file.size
+    file.file.seek(0, os.SEEK_END)
+    size = file.file.tell()
+    file.file.seek(0)
+    return size
+
+
+def _hash_upload(file: UploadFile) -> str:
+    """SHA-256 of the spooled upload's bytes (blocking; run in a thread)."""
+    digest = hashlib.sha256()
+    file.file.seek(0)
+    for chunk in iter(lambda: file.file.read(_HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+    file.file.seek(0)
+    return digest.hexdigest()
+
+
+async def _store_upload(file: UploadFile) -> Dict[str, Any]:
+    """Stream one upload to MinIO and queue its post-upload processing."""
+    file_id = str(uuid.uuid4())
+    file_name = f"{file_id}_{file.filename}"
+    size = _upload_size(file)
+    content_type = file.content_type or "application/octet-stream"
+
+    await upload_fileobj(file_name, file.file, size, content_type)
+
+    # Checksum verification and metadata extraction run in the background. The
+    # object is already stored, so a failed enqueue must not fail the upload.
     try:
-        file_id = str(uuid.uuid4())
-        file_name = f"{file_id}_{file.filename}"
-
-        content = await file.read()
-        stream = io.BytesIO(content)  # 🔧 Wrap bytes in a file-like stream
-
-        minio_client.put_object(
-            bucket_name=settings.MINIO_BUCKET,
-            object_name=file_name,
-            data=stream,  # ✅ file-like object
-            length=len(content),
-            content_type=file.content_type or "application/octet-stream"
-        )
+        job_id = await schedule_post_upload(file_name, size, content_type)
+    except Exception as e:
+        logger.error(f"Could not queue post-upload processing for {file_name}: {e}")
+        return {"filename": file_name, "job_id": None}
+    return {"filename": file_name, "job_id": str(job_id)}
 
-        return {"filename": file_name, "message": "File uploaded successfully"}
+
+@router.post("/upload")
+async def upload_file(
+    file: UploadFile = File(...),
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_HEADER, max_length=255
+    ),
+):
+    """Upload one file. With an Idempotency-Key header, retries skip the transfer."""
+    if idempotency_key is None:
+        return await _upload_single(file)
+    # Hash the content too, so reusing a key for a different file is rejected
+    content_hash = await asyncio.to_thread(_hash_upload, file)
+    fingerprint = request_fingerprint(
+        file.filename or "",
+        file.content_type or "",
+        str(_upload_size(file)),
+        content_hash,
+    )
+    return await idempotent_response(
+        "files.upload", idempotency_key, fingerprint, lambda: _upload_single(file)
+    )
+
+
+async def _upload_single(file: UploadFile) -> Dict[str, Any]:
+    try:
+        stored = await _store_upload(file)
+        return {
+            "filename": stored["filename"],
+            "message": "File uploaded successfully",
+            "job_id": stored["job_id"],
+        }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload/batch")
+async def upload_files(files: List[UploadFile] = File(...)):
+    """Upload many files in one request; each file succeeds or fails on its own."""
+    if len(files) > settings.upload_batch_max_files:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.upload_batch_max_files} files per batch",
+        )
+
+    semaphore = asyncio.Semaphore(settings.upload_concurrency)
+
+    async def upload_one(file: UploadFile) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                stored = await _store_upload(file)
+                return {
+                    "original_filename": file.filename,
+                    "status": "uploaded",
+                    **stored,
+                }
+            except Exception as e:
+                return {
+                    "original_filename": file.filename,
+                    "status": "failed",
+                    "error": str(e),
+                }
+
+    results = await asyncio.gather(*(upload_one(file) for file in files))
+    uploaded = sum(1 for result in results if result["status"] == "uploaded")
+    failed = len(results) - uploaded
+    return JSONResponse(
+        # 207 tells the client to inspect the per-file results
+        status_code=status.HTTP_207_MULTI_STATUS if failed else status.HTTP_200_OK,
+        content={"uploaded": uploaded, "failed": failed, "results": results},
+    )
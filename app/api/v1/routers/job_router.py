@@ -0,0 +1,27 @@
+from fastapi import APIRouter, HTTPException, Query, status
+from app.domains.job.models import JobOut
+from app.domains.job.service import fetch_job, list_jobs
+from typing import List, Optional
+from uuid import UUID
+
+router = APIRouter(tags=["Jobs"])
+
+
+@router.get("/", response_model=List[JobOut])
+async def list_jobs_route(
+    status_filter: Optional[str] = Query(None, alias="status"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """List the most recent background jobs, optionally filtered by status."""
+    return await list_jobs(status_filter, limit)
+
+
+@router.get("/{job_id}", response_model=JobOut)
+async def get_job(job_id: UUID):
+    """Get a background job's status, attempts and result."""
+    job = await fetch_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+        )
+    return job
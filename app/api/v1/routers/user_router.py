@@ -1,12 +1,21 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Header
+from fastapi.responses import StreamingResponse
 from app.api.deps import get_current_user
+from app.core.idempotency import (
+    IDEMPOTENCY_HEADER,
+    idempotent_response,
+    request_fingerprint,
+)
 from app.domains.user.service import (
     fetch_user,
-    create_user,
+    register_user,
     get_all_users,
+    export_users,
     update_user_service,
     delete_user,
     UserNotFoundError,  # Import the custom exception
+    EmailAlreadyRegisteredError,
+    UserCreationError,
 )
 from app.domains.user.models import (
     UserCreate,
@@ -15,37 +24,64 @@ from app.domains.user.models import (
     UserWithToken,
     LoginRequest,
 )
-from typing import List
+from datetime import datetime
+from typing import List, Literal, Optional
 from uuid import UUID
 from app.core.jwt import create_access_token
-from app.domains.user.repository import get_user_by_email
+from app.domains.user.repository import get_user_repository
 from app.core.security import verify_password
 
 router = APIRouter(tags=["Users"])
 
 
 @router.post("/", response_model=UserWithToken, status_code=status.HTTP_201_CREATED)
-async def create_user_endpoint(user: UserCreate):
-    """Create a new user with email and password."""
-    existing_user = await get_user_by_email(user.email)
-    if existing_user:
+async def create_user_endpoint(
+    user: UserCreate,
+    idempotency_key: Optional[str] = Header(
+        None, alias=IDEMPOTENCY_HEADER, max_length=255
+    ),
+):
+    """Create a new user with email and password.
+
+    With an Idempotency-Key header, retries replay the first result instead
+    of hashing and inserting again. Only the user is stored; every response
+    gets a freshly issued token.
+    """
+    if idempotency_key is None:
+        return _with_token(await _create_user(user))
+    return await idempotent_response(
+        "users.create",
+        idempotency_key,
+        request_fingerprint(user.model_dump_json()),
+        lambda: _create_user(user),
+        status_code=status.HTTP_201_CREATED,
+        render=lambda body: _with_token(UserOut(**body)),
+    )
+
+
+def _with_token(created_user: UserOut) -> UserWithToken:
+    token = create_access_token({"sub": str(created_user.id)})
+    return UserWithToken(user=created_user, access_token=token)
+
+
+async def _create_user(user: UserCreate) -> UserOut:
+    """Register the user; unexpected errors propagate as 5xx (never cached)."""
+    try:
+        created_user = await register_user(user)
+    except EmailAlreadyRegisteredError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
-
-    user_id = await create_user(user)
-    if user_id is None:
+    except UserCreationError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Failed to create user"
         )
-    created_user = await fetch_user(user_id)
     if created_user is None:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="User created but could not be retrieved",
         )
-    token = create_access_token({"sub": str(user_id)})
-    return UserWithToken(user=created_user, access_token=token)
+    return created_user
 
 
 @router.get("/profile", response_model=UserOut)
@@ -54,6 +90,25 @@ async def get_profile(current_user: UserOut = Depends(get_current_user)):
     return current_user
 
 
+_EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+@router.get("/export")
+async def export_users_route(
+    format: Literal["csv", "ndjson"] = "csv",
+    updated_since: Optional[datetime] = None,
+):
+    """Stream all users (without passwords) as CSV or NDJSON.
+
+    Pass updated_since for incremental exports; rows are ordered by updated_at.
+    """
+    return StreamingResponse(
+        export_users(format, updated_since),
+        media_type=_EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="users.{format}"'},
+    )
+
+
 @router.get("/{user_id}", response_model=UserOut)
 async def get_user(user_id: UUID):
     """Get a user by ID."""
@@ -107,7 +162,7 @@ async def fetch_users():
 
 @router.post("/login", response_model=UserWithToken)
 async def login(data: LoginRequest):
-    user = await get_user_by_email(data.email)
+    user = await get_user_repository().get_user_by_email(data.email)
     if user is None or not verify_password(data.password, user["password"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
     # Convert to UserOut model to ensure consistent format
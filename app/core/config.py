@@ -1,3 +1,4 @@
+from typing import List, Literal
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +13,42 @@ class Settings(BaseSettings):
     MINIO_ROOT_PASSWORD: str
     MINIO_BUCKET: str
 
+    # "memory" keeps users in process (tests, benchmarks); jobs, idempotency
+    # keys and migrations still use Postgres
+    user_storage_backend: Literal["postgres", "memory"] = "postgres"
+
+    # Queries slower than this (pool wait + execution) are logged by db_query
+    slow_query_threshold_ms: float = 500.0
+    # Capture an EXPLAIN (ANALYZE, BUFFERS) plan for slow SELECT statements
+    slow_query_explain: bool = False
+    # At most one plan per normalized statement in this window
+    slow_query_explain_cooldown_seconds: float = 600.0
+
+    # Background job runner
+    job_workers: int = 2
+    job_executor_workers: int = 2  # threads for CPU-bound job steps (hashing etc.)
+    job_poll_interval_seconds: float = 5.0
+    job_lease_seconds: float = 300.0  # a running job is reclaimed after this long
+    job_max_attempts: int = 5
+    job_retry_base_seconds: float = 2.0
+    job_retry_max_seconds: float = 300.0
+
+    # File uploads
+    upload_concurrency: int = 8  # files streamed to MinIO at once per batch
+    upload_batch_max_files: int = 500
+    upload_part_size: int = 10 * 1024 * 1024  # multipart part size (min 5 MiB)
+    upload_part_concurrency: int = 4  # parts of one large file uploaded at once
+
+    # Idempotency-Key support
+    idempotency_ttl_seconds: float = 24 * 60 * 60  # how long responses are replayed
+    idempotency_lock_seconds: float = 60.0  # renewed while the owner runs
+    idempotency_wait_seconds: float = 30.0  # how long duplicates wait for the first
+    idempotency_cache_size: int = 10_000  # in-process replay cache entries
+
+    # Opt-in profiling middleware and admin endpoints
+    profiling_enabled: bool = False
+    admin_emails: List[str] = []  # JSON list in env, e.g. '["ops@example.com"]'
+
     class Config:
         env_file = ".env"
         extra = "forbid"
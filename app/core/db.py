@@ -1,11 +1,40 @@
 import asyncpg
 import asyncio
-import logging
-from typing import Optional, Callable, Any, Awaitable
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import (
+    Optional,
+    Callable,
+    Any,
+    Awaitable,
+    AsyncIterator,
+    Dict,
+    List,
+    Set,
+    Tuple,
+)
 from app.core.config import settings
+from app.core.logger import get_logger
 
 _db_pool: Optional[asyncpg.Pool] = None  # Global singleton pool
-logger = logging.getLogger("db")
+# Connection bound by unit_of_work() for the current task; reused by db_query
+_current_conn: ContextVar[Optional[asyncpg.Connection]] = ContextVar(
+    "db_current_conn", default=None
+)
+logger = get_logger("db")
+
+# Methods of asyncpg.Connection that run SQL and are recorded for the slow-query log
+_TRACED_METHODS = {"execute", "executemany", "fetch", "fetchrow", "fetchval"}
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_MAX_EXPLAIN_TASKS = 2
+_MAX_EXPLAIN_COOLDOWN_ENTRIES = 1000
+
+_explain_tasks: Set[asyncio.Task] = set()
+_explain_in_flight: Set[str] = set()
+# Normalized statement -> monotonic time its plan was last captured
+_explain_last_run: Dict[str, float] = {}
 
 
 async def get_db_pool() -> asyncpg.Pool:
@@ -35,8 +64,177 @@ async def get_db_pool() -> asyncpg.Pool:
     return _db_pool
 
 
+class _TracedConnection:
+    """Proxy around an asyncpg connection that records statements and durations."""
+
+    def __init__(self, conn: asyncpg.Connection):
+        self._conn = conn
+        self.statements: List[Tuple[str, tuple, float]] = []
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._conn, name)
+        if name not in _TRACED_METHODS:
+            return attr
+
+        async def traced(query: str, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await attr(query, *args, **kwargs)
+            finally:
+                self.statements.append((query, args, time.perf_counter() - start))
+
+        return traced
+
+
+def _redact_sql(sql: str) -> str:
+    """Collapse whitespace and mask string literals (pypika inlines values into SQL)."""
+    return _STRING_LITERAL.sub("'?'", " ".join(sql.split()))
+
+
+def _redact_args(args: tuple) -> str:
+    return ", ".join(f"${i}=<{type(arg).__name__}>" for i, arg in enumerate(args, 1))
+
+
+def _caller_name(query_func: Callable) -> str:
+    """Repository function that built query_func, e.g. '...get_user_by_id'."""
+    qualname = getattr(query_func, "__qualname__", repr(query_func))
+    module = getattr(query_func, "__module__", "")
+    return f"{module}.{qualname.split('.<locals>')[0]}"
+
+
+def _log_slow_query(
+    query_func: Callable,
+    statements: List[Tuple[str, tuple, float]],
+    wait_s: float,
+    exec_s: float,
+) -> None:
+    total_ms = (wait_s + exec_s) * 1000
+    if total_ms < settings.slow_query_threshold_ms:
+        return
+
+    caller = _caller_name(query_func)
+    lines = [
+        f"  [{elapsed * 1000:.1f}ms] {_redact_sql(sql)}"
+        + (f" | {_redact_args(args)}" if args else "")
+        for sql, args, elapsed in statements
+    ]
+    logger.warning(
+        f"Slow query in {caller}: total={total_ms:.1f}ms "
+        f"pool_wait={wait_s * 1000:.1f}ms execute={exec_s * 1000:.1f}ms\n"
+        + "\n".join(lines)
+    )
+
+    if settings.slow_query_explain and statements:
+        sql, args, elapsed = max(statements, key=lambda statement: statement[2])
+        # Gate on the statement's own time: pool wait says nothing about the plan,
+        # and re-running queries against a saturated pool only adds load.
+        # ANALYZE really executes the statement, so only plain reads are sampled.
+        if (
+            elapsed * 1000 >= settings.slow_query_threshold_ms
+            and sql.lstrip().upper().startswith("SELECT")
+        ):
+            _schedule_explain(caller, sql, args)
+
+
+def _explain_cooling_down(statement: str) -> bool:
+    """True if this normalized statement had a plan captured recently."""
+    now = time.monotonic()
+    cooldown = settings.slow_query_explain_cooldown_seconds
+    if len(_explain_last_run) > _MAX_EXPLAIN_COOLDOWN_ENTRIES:
+        for stale in [k for k, t in _explain_last_run.items() if now - t >= cooldown]:
+            del _explain_last_run[stale]
+    last = _explain_last_run.get(statement)
+    if last is not None and now - last < cooldown:
+        return True
+    _explain_last_run[statement] = now
+    return False
+
+
+def _schedule_explain(caller: str, sql: str, args: tuple) -> None:
+    """Capture the plan on a separate connection, off the request path."""
+    if sql in _explain_in_flight or len(_explain_tasks) >= _MAX_EXPLAIN_TASKS:
+        return
+    if _explain_cooling_down(_redact_sql(sql)):
+        return
+    _explain_in_flight.add(sql)
+    task = asyncio.get_running_loop().create_task(_explain(caller, sql, args))
+    _explain_tasks.add(task)
+
+    def _done(finished: asyncio.Task) -> None:
+        _explain_tasks.discard(finished)
+        _explain_in_flight.discard(sql)
+
+    task.add_done_callback(_done)
+
+
+async def _explain(caller: str, sql: str, args: tuple) -> None:
+    try:
+        pool = await get_db_pool()
+        async with pool.acquire() as conn:
+            tr = conn.transaction()
+            await tr.start()
+            try:
+                rows = await conn.fetch(f"EXPLAIN (ANALYZE, BUFFERS) {sql}", *args)
+            finally:
+                await tr.rollback()
+        plan = "\n".join(_STRING_LITERAL.sub("'?'", row[0]) for row in rows)
+        logger.warning(f"Plan for slow query in {caller}:\n{plan}")
+    except Exception as e:
+        logger.error(f"Could not capture plan for slow query in {caller}: {e}")
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[asyncpg.Connection]:
+    """Run every db_query inside the block on one connection and one transaction.
+
+    Repository functions pick up the bound connection automatically, so a
+    multi-step service call takes a single pool connection and commits or rolls
+    back as a whole. Nested units of work become savepoints. Statements inside
+    the block must not run concurrently (e.g. via asyncio.gather), since an
+    asyncpg connection handles one operation at a time.
+    """
+    conn = _current_conn.get()
+    if conn is not None:
+        async with conn.transaction():
+            yield conn
+        return
+
+    pool = await get_db_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            token = _current_conn.set(conn)
+            try:
+                yield conn
+            finally:
+                _current_conn.reset(token)
+
+
 async def db_query(query_func: Callable[[Any], Awaitable[Any]]) -> Any:
-    """Helper to acquire a DB connection and run a query_func(conn)."""
+    """Helper to acquire a DB connection and run a query_func(conn).
+
+    Inside unit_of_work() the bound connection is reused instead of acquiring
+    one from the pool. Calls slower than settings.slow_query_threshold_ms are
+    logged with their redacted SQL, the calling repository function and the
+    pool wait/execute split.
+    """
+    conn = _current_conn.get()
+    if conn is not None:
+        return await _run_traced(query_func, conn, 0.0)
+
     pool = await get_db_pool()
+    acquire_start = time.perf_counter()
     async with pool.acquire() as conn:
-        return await query_func(conn)
+        return await _run_traced(query_func, conn, time.perf_counter() - acquire_start)
+
+
+async def _run_traced(
+    query_func: Callable[[Any], Awaitable[Any]], conn: asyncpg.Connection, wait_s: float
+) -> Any:
+    traced = _TracedConnection(conn)
+    exec_start = time.perf_counter()
+    try:
+        return await query_func(traced)
+    finally:
+        _log_slow_query(
+            query_func, traced.statements, wait_s, time.perf_counter() - exec_start
+        )
@@ -0,0 +1,338 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+from uuid import UUID, uuid4
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.db import db_query
+from app.core.logger import get_logger
+
+logger = get_logger("idempotency")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+_POLL_INTERVAL_SECONDS = 0.1
+_PURGE_INTERVAL_SECONDS = 300.0
+
+CacheKey = Tuple[str, str]
+
+
+class IdempotencyKeyReusedError(Exception):
+    """The key was already used for a request with a different payload."""
+
+
+class IdempotencyInProgressError(Exception):
+    """The first request with this key did not finish within the wait timeout."""
+
+
+@dataclass
+class StoredResponse:
+    status_code: int
+    body: Any
+    fingerprint: str
+
+
+# Bounded LRU of recent responses: (scope, key) -> (monotonic expiry, response)
+_cache: "OrderedDict[CacheKey, Tuple[float, StoredResponse]]" = OrderedDict()
+# Requests currently running in this process, awaited by concurrent duplicates
+_inflight: Dict[CacheKey, asyncio.Future] = {}
+_purge_tasks: Set[asyncio.Task] = set()
+_last_purge = 0.0
+
+
+def request_fingerprint(*parts: str) -> str:
+    """Keyed hash of the request payload, so stored rows don't reveal it."""
+    digest = hmac.new(settings.jwt_secret.encode("utf-8"), digestmod=hashlib.sha256)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def _cache_get(cache_key: CacheKey) -> Optional[StoredResponse]:
+    entry = _cache.get(cache_key)
+    if entry is None:
+        return None
+    expires, stored = entry
+    if expires < time.monotonic():
+        del _cache[cache_key]
+        return None
+    _cache.move_to_end(cache_key)
+    return stored
+
+
+def _cache_put(cache_key: CacheKey, stored: StoredResponse) -> None:
+    _cache[cache_key] = (time.monotonic() + settings.idempotency_ttl_seconds, stored)
+    _cache.move_to_end(cache_key)
+    while len(_cache) > settings.idempotency_cache_size:
+        _cache.popitem(last=False)
+
+
+def _replay(stored: StoredResponse, fingerprint: str) -> Tuple[StoredResponse, bool]:
+    if stored.fingerprint != fingerprint:
+        raise IdempotencyKeyReusedError()
+    return stored, True
+
+
+async def _claim(
+    scope: str, key: str, fingerprint: str, claim_token: UUID
+) -> Tuple[bool, Optional[Dict[str, Any]]]:
+    """Try to own the key. Returns (owned, existing row if another request owns it)."""
+    claim_sql = """
+        INSERT INTO idempotency_keys
+            (scope, key, fingerprint, claim_token, created_at, expires_at)
+        VALUES ($1, $2, $3, $4, NOW(), NOW() + make_interval(secs => $5))
+        ON CONFLICT (scope, key) DO UPDATE
+        SET fingerprint = EXCLUDED.fingerprint, claim_token = EXCLUDED.claim_token,
+            status_code = NULL, response = NULL,
+            created_at = NOW(), expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < NOW()
+        RETURNING key
+    """
+    existing_sql = """
+        SELECT fingerprint, status_code, response FROM idempotency_keys
+        WHERE scope = $1 AND key = $2
+    """
+
+    async def query(conn):
+        lock_seconds = float(settings.idempotency_lock_seconds)
+        if await conn.fetchval(
+            claim_sql, scope, key, fingerprint, claim_token, lock_seconds
+        ):
+            return True, None
+        row = await conn.fetchrow(existing_sql, scope, key)
+        return False, dict(row) if row else None
+
+    return await db_query(query)
+
+
+async def _extend_claim(scope: str, key: str, claim_token: UUID) -> bool:
+    """Push out the pending lock while its owner is still running. False if lost."""
+    sql = """
+        UPDATE idempotency_keys
+        SET expires_at = NOW() + make_interval(secs => $4)
+        WHERE scope = $1 AND key = $2 AND claim_token = $3 AND status_code IS NULL
+    """
+
+    async def query(conn):
+        lock_seconds = float(settings.idempotency_lock_seconds)
+        result = await conn.execute(sql, scope, key, claim_token, lock_seconds)
+        return result != "UPDATE 0"
+
+    return await db_query(query)
+
+
+async def _store(
+    scope: str, key: str, claim_token: UUID, stored: StoredResponse
+) -> bool:
+    """Save the response if this request still owns the key."""
+    sql = """
+        UPDATE idempotency_keys
+        SET status_code = $4, response = $5::jsonb,
+            expires_at = NOW() + make_interval(secs => $6)
+        WHERE scope = $1 AND key = $2 AND claim_token = $3 AND status_code IS NULL
+    """
+
+    async def query(conn):
+        ttl = float(settings.idempotency_ttl_seconds)
+        body = json.dumps(stored.body)
+        result = await conn.execute(
+            sql, scope, key, claim_token, stored.status_code, body, ttl
+        )
+        return result != "UPDATE 0"
+
+    return await db_query(query)
+
+
+async def _release(scope: str, key: str, claim_token: UUID) -> None:
+    """Drop an unfinished claim so a retry can run the request again."""
+    sql = """
+        DELETE FROM idempotency_keys
+        WHERE scope = $1 AND key = $2 AND claim_token = $3 AND status_code IS NULL
+    """
+
+    async def query(conn):
+        await conn.execute(sql, scope, key, claim_token)
+
+    try:
+        await db_query(query)
+    except Exception as e:
+        logger.error(f"Could not release idempotency key {scope}/{key}: {e}")
+
+
+async def _keep_claim(scope: str, key: str, claim_token: UUID) -> None:
+    """Renew the pending lock until cancelled, so long requests aren't taken over."""
+    while True:
+        await asyncio.sleep(settings.idempotency_lock_seconds / 3)
+        try:
+            if not await _extend_claim(scope, key, claim_token):
+                logger.warning(f"Lost idempotency claim on {scope}/{key}")
+                return
+        except Exception as e:
+            logger.error(f"Could not extend idempotency claim {scope}/{key}: {e}")
+
+
+async def _purge_expired() -> None:
+    sql = "DELETE FROM idempotency_keys WHERE expires_at < NOW()"
+
+    async def query(conn):
+        return await conn.execute(sql)
+
+    try:
+        result = await db_query(query)
+        logger.info(f"Purged expired idempotency keys: {result}")
+    except Exception as e:
+        logger.error(f"Could not purge expired idempotency keys: {e}")
+
+
+def _maybe_schedule_purge() -> None:
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge < _PURGE_INTERVAL_SECONDS:
+        return
+    _last_purge = now
+    task = asyncio.get_running_loop().create_task(_purge_expired())
+    _purge_tasks.add(task)
+    task.add_done_callback(_purge_tasks.discard)
+
+
+async def run_idempotent(
+    scope: str,
+    key: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Tuple[int, Any]]],
+) -> Tuple[StoredResponse, bool]:
+    """Run handler at most once per (scope, key) and return (response, replayed).
+
+    Responses are replayed from the in-process cache or the idempotency_keys
+    table. Concurrent duplicates wait for the first request, whether it runs in
+    this process or another one. An HTTPException below 500 is stored like a
+    normal response; server errors release the key so the client can retry.
+    """
+    cache_key = (scope, key)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.idempotency_wait_seconds
+
+    while True:
+        stored = _cache_get(cache_key)
+        if stored is not None:
+            return _replay(stored, fingerprint)
+        inflight = _inflight.get(cache_key)
+        if inflight is None:
+            break
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(inflight), timeout=max(deadline - loop.time(), 0)
+            )
+        except asyncio.TimeoutError:
+            raise IdempotencyInProgressError()
+
+    future = loop.create_future()
+    _inflight[cache_key] = future
+    try:
+        return await _run_claimed(scope, key, fingerprint, handler, deadline)
+    finally:
+        del _inflight[cache_key]
+        future.set_result(None)
+
+
+async def _run_claimed(
+    scope: str,
+    key: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Tuple[int, Any]]],
+    deadline: float,
+) -> Tuple[StoredResponse, bool]:
+    loop = asyncio.get_running_loop()
+    _maybe_schedule_purge()
+    claim_token = uuid4()
+
+    while True:
+        owned, row = await _claim(scope, key, fingerprint, claim_token)
+        if owned:
+            break
+        if row is None:
+            continue  # expired and purged between the two statements
+        if row["fingerprint"] != fingerprint:
+            raise IdempotencyKeyReusedError()
+        if row["status_code"] is not None:
+            stored = StoredResponse(
+                row["status_code"], json.loads(row["response"]), fingerprint
+            )
+            _cache_put((scope, key), stored)
+            return stored, True
+        # Another process is running the first request with this key
+        if loop.time() >= deadline:
+            raise IdempotencyInProgressError()
+        await asyncio.sleep(_POLL_INTERVAL_SECONDS)
+
+    keeper = asyncio.create_task(_keep_claim(scope, key, claim_token))
+    try:
+        status_code, body = await handler()
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await _release(scope, key, claim_token)
+            raise
+        status_code, body = e.status_code, {"detail": e.detail}
+    except BaseException:
+        await _release(scope, key, claim_token)
+        raise
+    finally:
+        keeper.cancel()
+        await asyncio.gather(keeper, return_exceptions=True)
+
+    stored = StoredResponse(status_code, body, fingerprint)
+    if await _store(scope, key, claim_token, stored):
+        _cache_put((scope, key), stored)
+    else:
+        # Our lock lapsed and another request took the key over; its result wins
+        logger.warning(f"Idempotency key {scope}/{key} was taken over; not stored")
+    return stored, False
+
+
+async def idempotent_response(
+    scope: str,
+    key: str,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = status.HTTP_200_OK,
+    render: Optional[Callable[[Any], Any]] = None,
+) -> JSONResponse:
+    """Endpoint helper: run handler once per Idempotency-Key and build the response.
+
+    Only the handler's result is stored. If given, render turns a stored
+    success body into the response on every send (first run and replays), so
+    per-response data such as access tokens is never persisted.
+    """
+
+    async def run() -> Tuple[int, Any]:
+        return status_code, jsonable_encoder(await handler())
+
+    try:
+        stored, replayed = await run_idempotent(scope, key, fingerprint, run)
+    except IdempotencyKeyReusedError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"{IDEMPOTENCY_HEADER} was already used with a different request",
+        )
+    except IdempotencyInProgressError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"A request with this {IDEMPOTENCY_HEADER} is still in progress",
+        )
+
+    content = stored.body
+    if render is not None and stored.status_code < 400:
+        content = jsonable_encoder(render(stored.body))
+    headers = {REPLAYED_HEADER: "true"} if replayed else None
+    return JSONResponse(
+        status_code=stored.status_code, content=content, headers=headers
+    )
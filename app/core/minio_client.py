@@ -1,4 +1,6 @@
+from typing import BinaryIO
 from minio import Minio
+from starlette.concurrency import run_in_threadpool
 from app.core.config import settings
 
 minio_client = Minio(
@@ -12,3 +14,22 @@ async def ensure_bucket():
     if not minio_client.bucket_exists(settings.MINIO_BUCKET):
         minio_client.make_bucket(settings.MINIO_BUCKET)
 
+
+async def upload_fileobj(
+    object_name: str, data: BinaryIO, length: int, content_type: str
+) -> None:
+    """Stream a file-like object into the bucket without blocking the event loop.
+
+    Objects larger than settings.upload_part_size are sent as a multipart
+    upload with up to settings.upload_part_concurrency parts in flight.
+    """
+    await run_in_threadpool(
+        minio_client.put_object,
+        bucket_name=settings.MINIO_BUCKET,
+        object_name=object_name,
+        data=data,
+        length=length,
+        content_type=content_type,
+        part_size=settings.upload_part_size,
+        num_parallel_uploads=settings.upload_part_concurrency,
+    )
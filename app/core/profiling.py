@@ -0,0 +1,187 @@
+import asyncio
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Set, Tuple
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from app.core.logger import get_logger
+
+logger = get_logger("profiling")
+
+PROFILE_HEADER = "X-Profile"
+
+# Call tree pruning: deeper or cheaper branches are dropped from the output
+_MAX_TREE_DEPTH = 30
+_MIN_TREE_FRACTION = 0.005
+
+# cProfile can't nest, and one sampler at a time keeps overhead predictable
+_request_profile_active = False
+_sampler_lock = threading.Lock()
+
+FuncKey = Tuple[str, int, str]
+
+
+class ProfilerBusyError(Exception):
+    """Another profile or sampling session is already running."""
+
+
+def _label(func: FuncKey) -> str:
+    filename, line, name = func
+    if filename == "~":  # builtins, e.g. "<built-in method bcrypt.hashpw>"
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def build_call_tree(stats: pstats.Stats) -> List[Dict[str, Any]]:
+    """Turn cProfile's caller graph into a nested call tree with per-edge timings."""
+    raw = stats.stats  # func -> (cc, nc, tt, ct, callers)
+    children: Dict[FuncKey, List[Tuple[FuncKey, int, float]]] = defaultdict(list)
+    for func, (_, _, _, _, callers) in raw.items():
+        for caller, (edge_calls, _, _, edge_cumulative) in callers.items():
+            children[caller].append((func, edge_calls, edge_cumulative))
+
+    # Roots are entered (at least partly) from frames cProfile never saw, e.g.
+    # the middleware itself, so their calls outnumber calls from recorded callers
+    entry_calls: Dict[FuncKey, int] = {}
+    for func, (_, calls, _, _, callers) in raw.items():
+        self_calls = callers[func][0] if func in callers else 0
+        known_calls = sum(edge[0] for caller, edge in callers.items() if caller != func)
+        if calls - self_calls > known_calls:
+            entry_calls[func] = calls - self_calls - known_calls
+    roots = list(entry_calls)
+    total = sum(raw[func][3] for func in roots) or 1.0
+
+    def node(
+        func: FuncKey, calls: int, cumulative: float, path: Set[FuncKey], depth: int
+    ) -> Dict[str, Any]:
+        entry = {
+            "function": _label(func),
+            "calls": calls,
+            "cumulative_ms": round(cumulative * 1000, 3),
+            "own_ms": round(raw[func][2] * 1000, 3),  # across all callers
+            "children": [],
+        }
+        if depth >= _MAX_TREE_DEPTH or func in path:
+            return entry
+        path = path | {func}
+        for child, edge_calls, edge_cumulative in sorted(
+            children[func], key=lambda edge: edge[2], reverse=True
+        ):
+            if edge_cumulative / total < _MIN_TREE_FRACTION:
+                break
+            entry["children"].append(
+                node(child, edge_calls, edge_cumulative, path, depth + 1)
+            )
+        return entry
+
+    return [
+        node(func, entry_calls[func], raw[func][3], set(), 0)
+        for func in sorted(roots, key=lambda func: raw[func][3], reverse=True)
+        if raw[func][3] / total >= _MIN_TREE_FRACTION
+    ]
+
+
+class ProfilingMiddleware(BaseHTTPMiddleware):
+    """Profile a single request with cProfile when it carries `X-Profile: 1`.
+
+    The response body is replaced by the request's call tree. cProfile hooks the
+    event loop thread, so work from other requests running concurrently also
+    shows up; profile on a quiet instance for clean results.
+    """
+
+    def __init__(self, app, authorize: Callable[[Request], Awaitable[bool]]):
+        super().__init__(app)
+        self._authorize = authorize
+
+    async def dispatch(self, request: Request, call_next):
+        global _request_profile_active
+        if request.headers.get(PROFILE_HEADER) != "1":
+            return await call_next(request)
+        if not await self._authorize(request):
+            return JSONResponse(
+                status_code=status.HTTP_403_FORBIDDEN,
+                content={"detail": "Admin privileges required to profile requests"},
+            )
+        if _request_profile_active:
+            return JSONResponse(
+                status_code=status.HTTP_409_CONFLICT,
+                content={"detail": "Another request is being profiled"},
+            )
+
+        _request_profile_active = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = await call_next(request)
+            # Drain the body so streaming work is part of the profile
+            async for _ in response.body_iterator:
+                pass
+        finally:
+            profiler.disable()
+            _request_profile_active = False
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        logger.info(
+            f"Profiled {request.method} {request.url.path}: {duration_ms:.1f}ms"
+        )
+        return JSONResponse(
+            content={
+                "method": request.method,
+                "path": request.url.path,
+                "status_code": response.status_code,
+                "duration_ms": round(duration_ms, 3),
+                "call_tree": build_call_tree(pstats.Stats(profiler)),
+            }
+        )
+
+
+def _collect_samples(duration: float, interval: float) -> Tuple[Counter, int]:
+    """Snapshot every thread's stack each interval (blocking; runs in a thread)."""
+    own_ident = threading.get_ident()
+    stacks: Counter = Counter()
+    samples = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                name = getattr(code, "co_qualname", code.co_name)
+                filename = os.path.basename(code.co_filename)
+                frames.append(f"{name} ({filename}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.append(names.get(ident, f"thread-{ident}"))
+            stacks[";".join(reversed(frames))] += 1
+        samples += 1
+        time.sleep(interval)
+    return stacks, samples
+
+
+async def sample_stacks(duration: float, interval: float) -> Tuple[str, int]:
+    """Sample all threads for `duration` seconds and return folded stacks.
+
+    The output is one `thread;outer;...;inner count` line per distinct stack,
+    the format read by flamegraph.pl, speedscope and similar tools. Sampling
+    runs in a separate thread, so the app is only paused for the brief
+    snapshots and not by instrumentation of every call. Snapshots are taken
+    when the sampler thread gets the GIL, so CPU bursts shorter than the
+    interpreter's switch interval (5ms by default) are under-represented.
+    """
+    if not _sampler_lock.acquire(blocking=False):
+        raise ProfilerBusyError()
+    try:
+        stacks, samples = await asyncio.to_thread(_collect_samples, duration, interval)
+    finally:
+        _sampler_lock.release()
+    folded = "\n".join(f"{stack} {count}" for stack, count in stacks.most_common())
+    return folded + "\n" if folded else "", samples
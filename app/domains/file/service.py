@@ -0,0 +1,68 @@
+import hashlib
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.core.minio_client import minio_client
+from app.domains.job.runner import job_runner
+from app.domains.job.service import enqueue_job
+from uuid import UUID
+from typing import Any, Dict, Optional
+
+logger = get_logger("file_service")
+
+POST_UPLOAD_JOB = "file.post_upload"
+_READ_CHUNK_SIZE = 1024 * 1024
+
+
+def _inspect_object(object_name: str) -> Dict[str, Any]:
+    """Stream a stored object back from MinIO and compute its checksums (blocking)."""
+    stat = minio_client.stat_object(settings.MINIO_BUCKET, object_name)
+    md5 = hashlib.md5()
+    sha256 = hashlib.sha256()
+    response = minio_client.get_object(settings.MINIO_BUCKET, object_name)
+    try:
+        for chunk in response.stream(_READ_CHUNK_SIZE):
+            md5.update(chunk)
+            sha256.update(chunk)
+    finally:
+        response.close()
+        response.release_conn()
+
+    etag = (stat.etag or "").strip('"')
+    # Multipart uploads get an ETag of the form "<md5 of part md5s>-<parts>",
+    # which can't be compared to the object's own MD5
+    if etag and "-" not in etag and etag != md5.hexdigest():
+        raise ValueError(
+            f"Checksum mismatch for {object_name}: etag={etag} md5={md5.hexdigest()}"
+        )
+
+    return {
+        "object_name": object_name,
+        "size": stat.size,
+        "content_type": stat.content_type,
+        "etag": etag,
+        "md5": md5.hexdigest(),
+        "sha256": sha256.hexdigest(),
+    }
+
+
+@job_runner.handler(POST_UPLOAD_JOB)
+async def process_uploaded_file(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Verify a freshly uploaded object and extract its metadata"""
+    result = await job_runner.run_in_executor(_inspect_object, payload["object_name"])
+    expected_size = payload.get("size")
+    if expected_size is not None and result["size"] != expected_size:
+        raise ValueError(
+            f"Size mismatch for {payload['object_name']}: "
+            f"expected {expected_size}, stored {result['size']}"
+        )
+    return result
+
+
+async def schedule_post_upload(
+    object_name: str, size: Optional[int], content_type: Optional[str]
+) -> UUID:
+    """Queue post-upload processing for an object that is already stored"""
+    return await enqueue_job(
+        POST_UPLOAD_JOB,
+        {"object_name": object_name, "size": size, "content_type": content_type},
+    )
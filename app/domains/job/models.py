@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+from uuid import UUID
+from datetime import datetime
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class JobOut(BaseModel):
+    id: UUID
+    kind: str
+    status: str
+    attempts: int
+    max_attempts: int
+    run_at: Optional[datetime] = None
+    last_error: Optional[str] = None
+    result: Optional[Dict[str, Any]] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
@@ -0,0 +1,190 @@
+import json
+from pypika import Query, Table, Order
+from uuid import UUID
+from typing import Optional, List, Dict, Any
+from app.core.db import db_query
+from app.core.logger import get_logger
+from app.domains.job.models import JOB_QUEUED, JOB_SUCCEEDED, JOB_FAILED
+
+logger = get_logger("job_repository")
+
+jobs_table = Table("jobs")
+
+_JOB_COLUMNS = (
+    jobs_table.id,
+    jobs_table.kind,
+    jobs_table.status,
+    jobs_table.attempts,
+    jobs_table.max_attempts,
+    jobs_table.run_at,
+    jobs_table.last_error,
+    jobs_table.result,
+    jobs_table.created_at,
+    jobs_table.updated_at,
+)
+
+
+def _job_from_row(row) -> Dict[str, Any]:
+    job = dict(row)
+    if job.get("result") is not None:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+async def create_job(
+    job_id: UUID, kind: str, payload: Dict[str, Any], max_attempts: int
+) -> bool:
+    """Insert a queued job"""
+    sql = """
+        INSERT INTO jobs
+            (id, kind, payload, max_attempts, run_at, created_at, updated_at)
+        VALUES ($1, $2, $3::jsonb, $4, NOW(), NOW(), NOW())
+    """
+
+    async def query(conn):
+        await conn.execute(sql, job_id, kind, json.dumps(payload), max_attempts)
+        return True
+
+    return await db_query(query)
+
+
+def _updated(result: str) -> bool:
+    # asyncpg returns a status string like 'UPDATE 1'
+    return isinstance(result, str) and result.split(" ")[-1] not in ("", "0")
+
+
+async def claim_next_job(lease_seconds: float) -> Optional[Dict[str, Any]]:
+    """Atomically claim the next due job, or one whose worker's lease expired.
+
+    FOR UPDATE SKIP LOCKED lets any number of workers (and processes) poll the
+    table concurrently without blocking on or double-claiming the same row.
+    Expired jobs that already used all their attempts (e.g. because they crash
+    the worker process) are failed instead of handed out again.
+    """
+    expire_sql = """
+        UPDATE jobs
+        SET status = 'failed',
+            last_error = COALESCE(last_error, 'Lease expired on final attempt'),
+            locked_until = NULL,
+            updated_at = NOW()
+        WHERE status = 'running' AND locked_until < NOW()
+          AND attempts >= max_attempts
+    """
+    claim_sql = """
+        UPDATE jobs
+        SET status = 'running',
+            attempts = attempts + 1,
+            locked_until = NOW() + make_interval(secs => $1),
+            updated_at = NOW()
+        WHERE id = (
+            SELECT id FROM jobs
+            WHERE (status = 'queued' AND run_at <= NOW())
+               OR (status = 'running' AND locked_until < NOW()
+                   AND attempts < max_attempts)
+            ORDER BY run_at
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING id, kind, payload, attempts, max_attempts
+    """
+
+    async def query(conn):
+        await conn.execute(expire_sql)
+        row = await conn.fetchrow(claim_sql, float(lease_seconds))
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        return job
+
+    return await db_query(query)
+
+
+async def extend_job_lease(job_id: UUID, attempts: int, lease_seconds: float) -> bool:
+    """Push out the lease of a job this attempt still owns. False if it was lost."""
+    sql = """
+        UPDATE jobs
+        SET locked_until = NOW() + make_interval(secs => $3), updated_at = NOW()
+        WHERE id = $1 AND status = 'running' AND attempts = $2
+    """
+
+    async def query(conn):
+        return _updated(await conn.execute(sql, job_id, attempts, float(lease_seconds)))
+
+    return await db_query(query)
+
+
+async def complete_job(
+    job_id: UUID, attempts: int, result: Optional[Dict[str, Any]]
+) -> bool:
+    """Mark a job as succeeded and store its result, if this attempt still owns it"""
+    sql = """
+        UPDATE jobs
+        SET status = $3, result = $4::jsonb, last_error = NULL,
+            locked_until = NULL, updated_at = NOW()
+        WHERE id = $1 AND status = 'running' AND attempts = $2
+    """
+
+    async def query(conn):
+        payload = json.dumps(result) if result is not None else None
+        return _updated(
+            await conn.execute(sql, job_id, attempts, JOB_SUCCEEDED, payload)
+        )
+
+    return await db_query(query)
+
+
+async def fail_job(
+    job_id: UUID, attempts: int, error: str, retry_in: Optional[float]
+) -> bool:
+    """Record a failed attempt: requeue after retry_in seconds, or fail for good.
+
+    Only applies if this attempt still owns the job.
+    """
+    sql = """
+        UPDATE jobs
+        SET status = $3, last_error = $4, locked_until = NULL,
+            run_at = NOW() + make_interval(secs => $5), updated_at = NOW()
+        WHERE id = $1 AND status = 'running' AND attempts = $2
+    """
+
+    async def query(conn):
+        status = JOB_QUEUED if retry_in is not None else JOB_FAILED
+        return _updated(
+            await conn.execute(
+                sql, job_id, attempts, status, error, float(retry_in or 0)
+            )
+        )
+
+    return await db_query(query)
+
+
+async def get_job_by_id(job_id: UUID) -> Optional[Dict[str, Any]]:
+    """Get job by ID from database"""
+
+    async def query(conn):
+        q = Query.from_(jobs_table).select(*_JOB_COLUMNS).where(jobs_table.id == job_id)
+        row = await conn.fetchrow(str(q))
+        return _job_from_row(row) if row else None
+
+    return await db_query(query)
+
+
+async def get_recent_jobs(
+    status: Optional[str] = None, limit: int = 50
+) -> List[Dict[str, Any]]:
+    """Get the most recently created jobs, optionally filtered by status"""
+
+    async def query(conn):
+        q = (
+            Query.from_(jobs_table)
+            .select(*_JOB_COLUMNS)
+            .orderby(jobs_table.created_at, order=Order.desc)
+            .limit(limit)
+        )
+        if status is not None:
+            q = q.where(jobs_table.status == status)
+        rows = await conn.fetch(str(q))
+        return [_job_from_row(row) for row in rows]
+
+    return await db_query(query)
@@ -0,0 +1,153 @@
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from uuid import UUID
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.domains.job.repository import (
+    claim_next_job,
+    complete_job,
+    extend_job_lease,
+    fail_job,
+)
+
+logger = get_logger("job_runner")
+
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class JobRunner:
+    """In-process worker pool that executes jobs stored in the `jobs` table.
+
+    Workers claim due jobs with SKIP LOCKED, so several app processes can share
+    the queue. Failed attempts are retried with exponential backoff until
+    max_attempts is reached. Blocking or CPU-heavy steps should go through
+    run_in_executor() so they stay off the event loop.
+    """
+
+    def __init__(self) -> None:
+        self._handlers: Dict[str, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def handler(self, kind: str) -> Callable[[JobHandler], JobHandler]:
+        """Register an async handler for jobs of the given kind."""
+
+        def register(func: JobHandler) -> JobHandler:
+            self._handlers[kind] = func
+            return func
+
+        return register
+
+    def notify(self) -> None:
+        """Wake idle workers after a job was enqueued in this process."""
+        self._wakeup.set()
+
+    async def run_in_executor(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a blocking function on the job thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.job_executor_workers, thread_name_prefix="job"
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(index))
+            for index in range(settings.job_workers)
+        ]
+        logger.info(f"Started {len(self._tasks)} job workers")
+
+    async def stop(self) -> None:
+        """Cancel workers; their running jobs are reclaimed when the lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _worker(self, index: int) -> None:
+        while True:
+            # Clear before claiming so a notify() during the claim isn't lost
+            self._wakeup.clear()
+            try:
+                job = await claim_next_job(settings.job_lease_seconds)
+            except Exception as e:
+                logger.error(f"job worker {index}: could not claim job: {e}")
+                job = None
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), timeout=settings.job_poll_interval_seconds
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id, kind, attempts = job["id"], job["kind"], job["attempts"]
+        handler = self._handlers.get(kind)
+        try:
+            if handler is None:
+                msg = f"No handler registered for {kind}"
+                await fail_job(job_id, attempts, msg, None)
+                return
+            heartbeat = asyncio.create_task(self._heartbeat(job_id, attempts))
+            try:
+                result = await handler(job["payload"])
+            except Exception as e:
+                retry_in = None
+                if attempts < job["max_attempts"]:
+                    retry_in = self._backoff(attempts)
+                logger.warning(
+                    f"job {job_id} ({kind}) attempt {attempts} failed: {e}"
+                    + (f"; retrying in {retry_in:.1f}s" if retry_in is not None else "")
+                )
+                recorded = await fail_job(job_id, attempts, str(e), retry_in)
+            else:
+                recorded = await complete_job(job_id, attempts, result)
+            finally:
+                heartbeat.cancel()
+                await asyncio.gather(heartbeat, return_exceptions=True)
+            if not recorded:
+                logger.warning(
+                    f"job {job_id} ({kind}) attempt {attempts}: lease was lost, "
+                    "outcome discarded"
+                )
+        except Exception as e:
+            # Bookkeeping failed; the lease expiry will hand the job out again
+            logger.error(f"job {job_id} ({kind}): could not record outcome: {e}")
+
+    async def _heartbeat(self, job_id: UUID, attempts: int) -> None:
+        """Keep extending the lease while the handler runs."""
+        interval = settings.job_lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                owned = await extend_job_lease(
+                    job_id, attempts, settings.job_lease_seconds
+                )
+            except Exception as e:
+                logger.error(f"job {job_id}: could not extend lease: {e}")
+                continue
+            if not owned:
+                logger.warning(f"job {job_id} attempt {attempts}: lease was lost")
+                return
+
+    @staticmethod
+    def _backoff(attempts: int) -> float:
+        delay = settings.job_retry_base_seconds * 2 ** (attempts - 1)
+        delay = min(delay, settings.job_retry_max_seconds)
+        return delay * random.uniform(0.5, 1.0)  # jitter spreads out retry storms
+
+
+job_runner = JobRunner()
@@ -0,0 +1,43 @@
+from app.core.config import settings
+from app.core.logger import get_logger
+from app.domains.job.models import JobOut
+from app.domains.job.repository import (
+    create_job,
+    get_job_by_id,
+    get_recent_jobs,
+)
+from app.domains.job.runner import job_runner
+from uuid import UUID, uuid4
+from typing import Any, Dict, List, Optional
+
+logger = get_logger("job_service")
+
+
+async def enqueue_job(
+    kind: str, payload: Dict[str, Any], max_attempts: Optional[int] = None
+) -> UUID:
+    """Queue a job for the background workers and return its ID"""
+    job_id = uuid4()
+    await create_job(job_id, kind, payload, max_attempts or settings.job_max_attempts)
+    job_runner.notify()
+    return job_id
+
+
+async def fetch_job(job_id: UUID) -> Optional[JobOut]:
+    """Fetch a job by ID"""
+    try:
+        row = await get_job_by_id(job_id)
+        if row:
+            return JobOut(**row)
+        return None
+    except Exception:
+        return None
+
+
+async def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[JobOut]:
+    """List the most recent jobs"""
+    try:
+        rows = await get_recent_jobs(status, limit)
+        return [JobOut(**row) for row in rows]
+    except Exception:
+        return []
@@ -1,7 +1,16 @@
-from pypika import Query, Table, functions as fn
+import asyncio
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+from contextlib import nullcontext
+from datetime import datetime, timezone
+import asyncpg
+from pypika import Query, Table, Parameter, functions as fn
 from uuid import UUID
-from typing import Optional, List, Dict, Any
-from app.core.db import db_query
+from typing import Optional, List, Dict, Any, AsyncContextManager, AsyncIterator
+from app.core.config import settings
+from app.core.db import db_query, get_db_pool, unit_of_work
 from app.core.logger import get_logger
 
 logger = get_logger("user_repository")
@@ -9,148 +18,406 @@ logger = get_logger("user_repository")
 # Define table once to avoid duplication
 users_table = Table("users")
 
+# Chunks buffered between the COPY reader and the HTTP response
+_EXPORT_QUEUE_SIZE = 16
+# Rows per chunk when the in-memory store renders CSV itself
+_EXPORT_CHUNK_ROWS = 1000
+# Columns returned to callers that must never see the password hash
+_PUBLIC_FIELDS = ("id", "name", "email", "created_at", "updated_at")
 
-async def get_user_by_id(user_id: UUID) -> Optional[Dict[str, Any]]:
-    """Get user by ID from database"""
 
-    async def query(conn):
-        q = (
-            Query.from_(users_table)
-            .select(
-                users_table.id,
-                users_table.name,
-                users_table.email,
-                users_table.created_at,
-                users_table.updated_at,
-            )
-            .where(users_table.id == user_id)
-        )
-        row = await conn.fetchrow(str(q))
-        return dict(row) if row else None
+class DuplicateEmailError(Exception):
+    """Raised by create_user when the email is already taken."""
 
-    return await db_query(query)
 
+class UserRepository(ABC):
+    """Storage interface used by the user service.
 
-async def get_user_by_email(email: str) -> Optional[Dict[str, Any]]:
-    """Get user by email from database"""
+    Rows are plain dicts; only the *_with_password and get_user_by_email
+    lookups include the password hash.
+    """
 
-    async def query(conn):
-        q = (
-            Query.from_(users_table)
-            .select(
+    @abstractmethod
+    async def get_user_by_id(self, user_id: UUID) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def get_user_by_id_with_password(
+        self, user_id: UUID
+    ) -> Optional[Dict[str, Any]]: ...
+
+    @abstractmethod
+    async def update_user(
+        self, user_id: UUID, name: Optional[str] = None, email: Optional[str] = None
+    ) -> bool: ...
+
+    @abstractmethod
+    async def create_user(
+        self, user_id: UUID, name: str, email: str, password: str
+    ) -> bool: ...
+
+    @abstractmethod
+    async def delete_user_by_id(self, user_id: UUID) -> bool: ...
+
+    @abstractmethod
+    async def get_all_users(self) -> List[Dict[str, Any]]: ...
+
+    @abstractmethod
+    def export_users(
+        self, fmt: str, updated_since: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]: ...
+
+    @abstractmethod
+    def unit_of_work(self) -> AsyncContextManager[Any]:
+        """Group several calls so they succeed or fail together."""
+
+    async def user_exists(self, user_id: UUID) -> bool:
+        """Check if user exists"""
+        user = await self.get_user_by_id(user_id)
+        exists = user is not None
+        logger.info(f"user_exists check for id={user_id}: {exists}")
+        return exists
+
+
+class PostgresUserRepository(UserRepository):
+    """asyncpg-backed storage; every call goes through db_query."""
+
+    def unit_of_work(self) -> AsyncContextManager[Any]:
+        return unit_of_work()
+
+    async def get_user_by_id(self, user_id: UUID) -> Optional[Dict[str, Any]]:
+        """Get user by ID from database"""
+
+        async def query(conn):
+            q = (
+                Query.from_(users_table)
+                .select(
+                    users_table.id,
+                    users_table.name,
+                    users_table.email,
+                    users_table.created_at,
+                    users_table.updated_at,
+                )
+                .where(users_table.id == user_id)
+            )
+            row = await conn.fetchrow(str(q))
+            return dict(row) if row else None
+
+        return await db_query(query)
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """Get user by email from database"""
+
+        async def query(conn):
+            q = (
+                Query.from_(users_table)
+                .select(
+                    users_table.id,
+                    users_table.name,
+                    users_table.email,
+                    users_table.password,
+                    users_table.created_at,
+                    users_table.updated_at,
+                )
+                .where(users_table.email == email)
+            )
+            row = await conn.fetchrow(str(q))
+            return dict(row) if row else None
+
+        return await db_query(query)
+
+    async def get_user_by_id_with_password(
+        self, user_id: UUID
+    ) -> Optional[Dict[str, Any]]:
+        """Get user by ID with password from database"""
+
+        async def query(conn):
+            q = (
+                Query.from_(users_table)
+                .select(
+                    users_table.id,
+                    users_table.name,
+                    users_table.email,
+                    users_table.password,
+                    users_table.created_at,
+                    users_table.updated_at,
+                )
+                .where(users_table.id == user_id)
+            )
+            row = await conn.fetchrow(str(q))
+            return dict(row) if row else None
+
+        return await db_query(query)
+
+    async def update_user(
+        self, user_id: UUID, name: Optional[str] = None, email: Optional[str] = None
+    ) -> bool:
+        """Update user information"""
+        if name is None and email is None:
+            return False
+
+        async def query(conn):
+            q = Query.update(users_table)
+            if name is not None:
+                q = q.set(users_table.name, name)
+
+            if email is not None:
+                q = q.set(users_table.email, email)
+
+            q = q.set(users_table.updated_at, fn.Now())
+            q = q.where(users_table.id == user_id)
+            try:
+                result = await conn.execute(str(q))
+            except asyncpg.UniqueViolationError:
+                raise DuplicateEmailError(email)
+            return result is not None
+
+        return await db_query(query)
+
+    async def create_user(
+        self, user_id: UUID, name: str, email: str, password: str
+    ) -> bool:
+        """Create a new user"""
+        sql = """
+            INSERT INTO users (id, name, email, password, created_at, updated_at)
+            VALUES ($1, $2, $3, $4, NOW(), NOW())
+        """
+
+        async def query(conn):
+            try:
+                await conn.execute(sql, user_id, name, email, password)
+            except asyncpg.UniqueViolationError:
+                raise DuplicateEmailError(email)
+            return True
+
+        return await db_query(query)
+
+    async def delete_user_by_id(self, user_id: UUID) -> bool:
+        """Delete user by ID. Returns True if a user was deleted, False otherwise."""
+
+        async def query(conn):
+            q = Query.from_(users_table).delete().where(users_table.id == user_id)
+            result = await conn.execute(str(q))
+            # asyncpg returns a string like 'DELETE 1' if a row was deleted
+            if isinstance(result, str) and result.startswith("DELETE"):
+                deleted_count = int(result.split(" ")[1])
+                logger.info(
+                    f"delete_user_by_id for id={user_id}: deleted_count={deleted_count}"
+                )
+                return deleted_count > 0
+            logger.info(f"delete_user_by_id for id={user_id}: deleted_count=0")
+            return False
+
+        return await db_query(query)
+
+    async def get_all_users(self) -> List[Dict[str, Any]]:
+        """Get all users from database"""
+
+        async def query(conn):
+            q = Query.from_(users_table).select(
                 users_table.id,
                 users_table.name,
                 users_table.email,
-                users_table.password,
                 users_table.created_at,
                 users_table.updated_at,
             )
-            .where(users_table.email == email)
-        )
-        row = await conn.fetchrow(str(q))
-        return dict(row) if row else None
-
-    return await db_query(query)
-
+            rows = await conn.fetch(str(q))
+            return [dict(row) for row in rows]
 
-async def get_user_by_id_with_password(user_id: UUID) -> Optional[Dict[str, Any]]:
-    """Get user by ID with password from database"""
+        return await db_query(query)
 
-    async def query(conn):
+    async def export_users(
+        self, fmt: str, updated_since: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        """Stream users (without password) as CSV or NDJSON chunks via COPY TO STDOUT"""
         q = (
             Query.from_(users_table)
             .select(
                 users_table.id,
                 users_table.name,
                 users_table.email,
-                users_table.password,
                 users_table.created_at,
                 users_table.updated_at,
             )
-            .where(users_table.id == user_id)
+            .orderby(users_table.updated_at)
         )
-        row = await conn.fetchrow(str(q))
-        return dict(row) if row else None
-
-    return await db_query(query)
-
-
-async def update_user(
-    user_id: UUID, name: Optional[str] = None, email: Optional[str] = None
-) -> bool:
-    """Update user information"""
-    if name is None and email is None:
-        return False
-
-    async def query(conn):
-        q = Query.update(users_table)
-        if name is not None:
-            q = q.set(users_table.name, name)
-
-        if email is not None:
-            q = q.set(users_table.email, email)
-
-        q = q.set(users_table.updated_at, fn.Now())
-        q = q.where(users_table.id == user_id)
-        result = await conn.execute(str(q))
-        return result is not None
-
-    return await db_query(query)
-
-
-async def create_user(user_id: UUID, name: str, email: str, password: str) -> bool:
-    """Create a new user"""
-    sql = """
-        INSERT INTO users (id, name, email, password, created_at, updated_at)
-        VALUES ($1, $2, $3, $4, NOW(), NOW())
+        args = []
+        if updated_since is not None:
+            q = q.where(users_table.updated_at >= Parameter("$1"))
+            args.append(updated_since)
+
+        if fmt == "ndjson":
+            # row_to_json never emits raw newlines, and CSV with control characters
+            # as quote/delimiter leaves the single JSON column untouched
+            sql = f"SELECT row_to_json(u)::text FROM ({q}) u"
+            copy_options = {"format": "csv", "quote": "\x01", "delimiter": "\x02"}
+        else:
+            sql = str(q)
+            copy_options = {"format": "csv", "header": True}
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=_EXPORT_QUEUE_SIZE)
+
+        async def write(chunk: bytes) -> None:
+            # Blocks COPY when the client reads slowly, keeping memory constant
+            await queue.put(chunk)
+
+        async def produce() -> None:
+            try:
+                # Not db_query: the connection stays busy for as long as the client
+                # reads, which would otherwise show up as a slow query
+                pool = await get_db_pool()
+                async with pool.acquire() as conn:
+                    await conn.copy_from_query(sql, *args, output=write, **copy_options)
+                await queue.put(None)
+            except Exception as e:
+                logger.error(f"export_users failed: {e}")
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                yield chunk
+        finally:
+            # Client went away or export finished: stop COPY and free the connection
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+
+class InMemoryUserRepository(UserRepository):
+    """Dict-backed storage indexed by id and email, for tests and benchmarks.
+
+    Methods never await, so each call runs without interleaving on the event
+    loop. unit_of_work() is a no-op and does not roll back partial writes.
     """
 
-    async def query(conn):
-        await conn.execute(sql, user_id, name, email, password)
-        return True
-
-    return await db_query(query)
-
+    def __init__(self) -> None:
+        self._users: Dict[UUID, Dict[str, Any]] = {}
+        self._ids_by_email: Dict[str, UUID] = {}
 
-async def delete_user_by_id(user_id: UUID) -> bool:
-    """Delete user by ID. Returns True if a user was deleted, False otherwise."""
+    @staticmethod
+    def _public(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {field: row[field] for field in _PUBLIC_FIELDS}
 
-    async def query(conn):
-        q = Query.from_(users_table).delete().where(users_table.id == user_id)
-        result = await conn.execute(str(q))
-        # asyncpg returns a string like 'DELETE 1' if a row was deleted
-        if isinstance(result, str) and result.startswith("DELETE"):
-            deleted_count = int(result.split(" ")[1])
-            logger.info(
-                f"delete_user_by_id for id={user_id}: deleted_count={deleted_count}"
-            )
-            return deleted_count > 0
-        logger.info(f"delete_user_by_id for id={user_id}: deleted_count=0")
-        return False
-
-    return await db_query(query)
+    async def get_user_by_id(self, user_id: UUID) -> Optional[Dict[str, Any]]:
+        row = self._users.get(user_id)
+        return self._public(row) if row else None
 
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        user_id = self._ids_by_email.get(email)
+        return dict(self._users[user_id]) if user_id is not None else None
 
-async def get_all_users() -> List[Dict[str, Any]]:
-    """Get all users from database"""
+    async def get_user_by_id_with_password(
+        self, user_id: UUID
+    ) -> Optional[Dict[str, Any]]:
+        row = self._users.get(user_id)
+        return dict(row) if row else None
 
-    async def query(conn):
-        q = Query.from_(users_table).select(
-            users_table.id,
-            users_table.name,
-            users_table.email,
-            users_table.created_at,
-            users_table.updated_at,
-        )
-        rows = await conn.fetch(str(q))
-        return [dict(row) for row in rows]
+    async def update_user(
+        self, user_id: UUID, name: Optional[str] = None, email: Optional[str] = None
+    ) -> bool:
+        if name is None and email is None:
+            return False
+        row = self._users.get(user_id)
+        if row is None:
+            return False
+        if email is not None and email != row["email"]:
+            if email in self._ids_by_email:
+                raise DuplicateEmailError(email)
+            del self._ids_by_email[row["email"]]
+            self._ids_by_email[email] = user_id
+            row["email"] = email
+        if name is not None:
+            row["name"] = name
+        row["updated_at"] = datetime.now(timezone.utc)
+        return True
 
-    return await db_query(query)
+    async def create_user(
+        self, user_id: UUID, name: str, email: str, password: str
+    ) -> bool:
+        if email in self._ids_by_email:
+            raise DuplicateEmailError(email)
+        now = datetime.now(timezone.utc)
+        self._users[user_id] = {
+            "id": user_id,
+            "name": name,
+            "email": email,
+            "password": password,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._ids_by_email[email] = user_id
+        return True
 
+    async def delete_user_by_id(self, user_id: UUID) -> bool:
+        row = self._users.pop(user_id, None)
+        if row is None:
+            return False
+        del self._ids_by_email[row["email"]]
+        return True
 
-async def user_exists(user_id: UUID) -> bool:
-    """Check if user exists"""
-    user = await get_user_by_id(user_id)
-    exists = user is not None
-    logger.info(f"user_exists check for id={user_id}: {exists}")
-    return exists
+    async def get_all_users(self) -> List[Dict[str, Any]]:
+        return [self._public(row) for row in self._users.values()]
+
+    async def export_users(
+        self, fmt: str, updated_since: Optional[datetime] = None
+    ) -> AsyncIterator[bytes]:
+        rows = sorted(self._users.values(), key=lambda row: row["updated_at"])
+        if updated_since is not None:
+            if updated_since.tzinfo is None:
+                updated_since = updated_since.replace(tzinfo=timezone.utc)
+            rows = [row for row in rows if row["updated_at"] >= updated_since]
+
+        if fmt == "ndjson":
+            for row in rows:
+                public = self._public(row)
+                line = json.dumps(
+                    {
+                        "id": str(public["id"]),
+                        "name": public["name"],
+                        "email": public["email"],
+                        "created_at": public["created_at"].isoformat(),
+                        "updated_at": public["updated_at"].isoformat(),
+                    }
+                )
+                yield (line + "\n").encode("utf-8")
+            return
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(_PUBLIC_FIELDS)
+        for index, row in enumerate(rows, 1):
+            writer.writerow([row[field] for field in _PUBLIC_FIELDS])
+            if index % _EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue().encode("utf-8")
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue().encode("utf-8")
+
+    def unit_of_work(self) -> AsyncContextManager[Any]:
+        return nullcontext()
+
+    def clear(self) -> None:
+        """Drop all users (e.g. between tests)."""
+        self._users.clear()
+        self._ids_by_email.clear()
+
+
+_repository: Optional[UserRepository] = None
+
+
+def get_user_repository() -> UserRepository:
+    """Return the user storage selected by settings.user_storage_backend."""
+    global _repository
+    if _repository is None:
+        if settings.user_storage_backend == "memory":
+            _repository = InMemoryUserRepository()
+        else:
+            _repository = PostgresUserRepository()
+    return _repository
@@ -2,31 +2,33 @@ import logging
 
 from app.core.logger import get_logger
 from app.core.checker import user_exists_checker
-from app.domains.user.repository import (
-    get_user_by_id,
-    get_user_by_email,
-    create_user as repo_create_user,
-    update_user as repo_update_user,
-    delete_user_by_id,
-    get_all_users as repo_get_all_users,
-)
+from app.domains.user.repository import DuplicateEmailError, get_user_repository
 from app.domains.user.models import UserCreate, UserOut, UserUpdate
 from app.core.security import hash_password
+from datetime import datetime
 from uuid import UUID, uuid4
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional
 
 
 class UserNotFoundError(Exception):
     pass
 
 
+class EmailAlreadyRegisteredError(Exception):
+    pass
+
+
+class UserCreationError(Exception):
+    pass
+
+
 logger = get_logger("user_service")
 
 
 async def fetch_user(user_id: UUID) -> Optional[UserOut]:
     """Fetch a user by ID"""
     try:
-        row = await get_user_by_id(user_id)
+        row = await get_user_repository().get_user_by_id(user_id)
         if row:
             return UserOut(**row)
         return None
@@ -37,7 +39,7 @@ async def fetch_user(user_id: UUID) -> Optional[UserOut]:
 async def fetch_user_by_email(email: str) -> Optional[UserOut]:
     """Fetch a user by email"""
     try:
-        row = await get_user_by_email(email)
+        row = await get_user_repository().get_user_by_email(email)
         if row:
             return UserOut(**row)
         return None
@@ -47,15 +49,19 @@ async def fetch_user_by_email(email: str) -> Optional[UserOut]:
 
 async def update_user_service(user_id: UUID, user_update: UserUpdate) -> bool:
     """Update user information (name and/or email)"""
+    repo = get_user_repository()
     try:
-        exists = await user_exists_checker(user_id)
-        logger.info(f"update_user_service: user_exists({user_id}) = {exists}")
-        if not exists:
-            logger.warning(f"update_user_service: user_id {user_id} not found")
-            raise UserNotFoundError(f"User with id {user_id} not found")
-        if user_update.name is None and user_update.email is None:
-            return False
-        return await repo_update_user(user_id, user_update.name, user_update.email)
+        async with repo.unit_of_work():
+            exists = await user_exists_checker(user_id)
+            logger.info(f"update_user_service: user_exists({user_id}) = {exists}")
+            if not exists:
+                logger.warning(f"update_user_service: user_id {user_id} not found")
+                raise UserNotFoundError(f"User with id {user_id} not found")
+            if user_update.name is None and user_update.email is None:
+                return False
+            return await repo.update_user(
+                user_id, user_update.name, user_update.email
+            )
     except UserNotFoundError:
         raise
     except Exception as e:
@@ -65,13 +71,15 @@ async def update_user_service(user_id: UUID, user_update: UserUpdate) -> bool:
 
 async def delete_user(user_id: UUID) -> bool:
     """Delete a user by ID. Returns True if deleted, False if not found."""
+    repo = get_user_repository()
     try:
-        exists = await user_exists_checker(user_id)
-        logger.info(f"delete_user: user_exists({user_id}) = {exists}")
-        if not exists:
-            logger.warning(f"delete_user: user_id {user_id} not found")
-            return False
-        return await delete_user_by_id(user_id)
+        async with repo.unit_of_work():
+            exists = await user_exists_checker(user_id)
+            logger.info(f"delete_user: user_exists({user_id}) = {exists}")
+            if not exists:
+                logger.warning(f"delete_user: user_id {user_id} not found")
+                return False
+            return await repo.delete_user_by_id(user_id)
     except Exception as e:
         logger.error(f"delete_user error: {e}")
         return False
@@ -82,7 +90,7 @@ async def create_user(user: UserCreate) -> Optional[UUID]:
     try:
         user_id = uuid4()
         hashed_password = hash_password(user.password)
-        success = await repo_create_user(
+        success = await get_user_repository().create_user(
             user_id, user.name, user.email, hashed_password
         )
         if success:
@@ -92,22 +100,56 @@ async def create_user(user: UserCreate) -> Optional[UUID]:
         return None
 
 
+async def register_user(user: UserCreate) -> Optional[UserOut]:
+    """Create a user and return it; email check, insert and fetch are one transaction.
+
+    Returns None if the user was created but could not be read back. Database
+    errors propagate so callers can report them as server errors.
+    """
+    # Hash before taking a connection so bcrypt doesn't hold it
+    hashed_password = hash_password(user.password)
+    repo = get_user_repository()
+    try:
+        async with repo.unit_of_work():
+            if await repo.get_user_by_email(user.email):
+                raise EmailAlreadyRegisteredError(
+                    f"Email {user.email} already registered"
+                )
+            user_id = uuid4()
+            created = await repo.create_user(
+                user_id, user.name, user.email, hashed_password
+            )
+            if not created:
+                raise UserCreationError(f"Failed to create user {user.email}")
+            row = await repo.get_user_by_id(user_id)
+    except DuplicateEmailError:
+        # Lost a race with a concurrent signup for the same email
+        raise EmailAlreadyRegisteredError(f"Email {user.email} already registered")
+    if row is None:
+        logger.error(f"register_user: user {user_id} created but not found")
+        return None
+    return UserOut(**row)
+
+
 async def get_all_users() -> List[UserOut]:
     """Get all users"""
     try:
-        rows = await repo_get_all_users()
+        rows = await get_user_repository().get_all_users()
         return [UserOut(**row) for row in rows]
     except Exception:
         return []
 
 
+def export_users(
+    fmt: str, updated_since: Optional[datetime] = None
+) -> AsyncIterator[bytes]:
+    """Stream all users (or those updated since a timestamp) as CSV or NDJSON"""
+    return get_user_repository().export_users(fmt, updated_since)
+
+
 async def get_user_by_id_with_password(user_id: UUID) -> Optional[dict]:
     """Get user with password for authentication purposes"""
     try:
-        from app.domains.user.repository import (
-            get_user_by_id_with_password as repo_get_user_with_password,
-        )
-
-        return await repo_get_user_with_password(user_id)
+        return await get_user_repository().get_user_by_id_with_password(user_id)
     except Exception:
         return None
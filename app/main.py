@@ -2,9 +2,14 @@ from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.core.db_init import init_db_schema
 
+from app.api.deps import is_admin_request
 from app.api.v1.api_v1 import api_router
+from app.api.v1.routers import admin_router
+from app.core.config import settings
+from app.core.profiling import ProfilingMiddleware
 from app.migrations.run import run_migrations
 from app.core.minio_client import ensure_bucket
+from app.domains.job.runner import job_runner
 
 
 
@@ -13,10 +18,16 @@ async def lifespan(app: FastAPI):
     await run_migrations()
     await init_db_schema()
     await ensure_bucket()
+    await job_runner.start()
     yield
     # Shutdown (if needed, close DB pool here)
+    await job_runner.stop()
 
 
 app = FastAPI(lifespan=lifespan)
 
 app.include_router(api_router, prefix="/api/v1")
+
+if settings.profiling_enabled:
+    app.add_middleware(ProfilingMiddleware, authorize=is_admin_request)
+    app.include_router(admin_router.router, prefix="/api/v1/admin", tags=["Admin"])
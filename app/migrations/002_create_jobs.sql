@@ -0,0 +1,19 @@
+CREATE TABLE IF NOT EXISTS jobs (
+    id UUID PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    run_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    result JSONB,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Partial indexes keep the claim query cheap as finished jobs accumulate
+CREATE INDEX IF NOT EXISTS idx_jobs_queued_run_at ON jobs(run_at) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running_locked_until ON jobs(locked_until) WHERE status = 'running';
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
@@ -0,0 +1,2 @@
+-- Incremental exports filter and order by updated_at
+CREATE INDEX IF NOT EXISTS idx_users_updated_at ON users(updated_at);
@@ -0,0 +1,24 @@
+import pytest
+
+from app.core.db import _redact_sql
+
+
+def test_redact_sql_masks_literals_and_collapses_whitespace():
+    sql = """
+        SELECT "id" FROM "users"
+        WHERE "email"='ann@example.com' AND "name"='O''Brien'
+    """
+    assert _redact_sql(sql) == (
+        """SELECT "id" FROM "users" WHERE "email"='?' AND "name"='?'"""
+    )
+
+
+def test_redact_sql_keeps_placeholders():
+    assert _redact_sql("SELECT * FROM users WHERE id = $1") == (
+        "SELECT * FROM users WHERE id = $1"
+    )
+
+
+@pytest.mark.parametrize("sql", ["", "   "])
+def test_redact_sql_empty(sql):
+    assert _redact_sql(sql) == ""
@@ -0,0 +1,40 @@
+import asyncio
+import io
+
+from fastapi import UploadFile
+
+from app.api.v1.routers import file_router
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def _upload(data=b"hello", filename="a.txt"):
+    return UploadFile(file=io.BytesIO(data), filename=filename, size=len(data))
+
+
+def test_store_upload_survives_enqueue_failure(monkeypatch):
+    stored = []
+
+    async def upload_fileobj(name, fileobj, size, content_type):
+        stored.append((name, fileobj.read(), size))
+
+    async def schedule_post_upload(name, size, content_type):
+        raise ConnectionError("database is down")
+
+    monkeypatch.setattr(file_router, "upload_fileobj", upload_fileobj)
+    monkeypatch.setattr(file_router, "schedule_post_upload", schedule_post_upload)
+
+    result = run(file_router._store_upload(_upload()))
+
+    assert result["job_id"] is None
+    assert result["filename"].endswith("_a.txt")
+    assert stored == [(result["filename"], b"hello", 5)]
+
+
+def test_hash_upload_covers_content_and_rewinds():
+    first, second = _upload(b"hello"), _upload(b"world")
+
+    assert file_router._hash_upload(first) != file_router._hash_upload(second)
+    assert first.file.read() == b"hello"
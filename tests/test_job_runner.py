@@ -0,0 +1,49 @@
+import asyncio
+
+from app.core.config import settings
+from app.domains.job import runner
+from app.domains.job.runner import JobRunner
+
+
+def test_backoff_grows_exponentially_with_jitter_and_cap(monkeypatch):
+    monkeypatch.setattr(settings, "job_retry_base_seconds", 2.0)
+    monkeypatch.setattr(settings, "job_retry_max_seconds", 30.0)
+
+    for attempts, full_delay in [(1, 2.0), (2, 4.0), (3, 8.0), (10, 30.0)]:
+        for _ in range(20):
+            delay = JobRunner._backoff(attempts)
+            assert full_delay * 0.5 <= delay <= full_delay
+
+
+def test_notify_during_empty_claim_wakes_worker(monkeypatch):
+    monkeypatch.setattr(settings, "job_poll_interval_seconds", 30.0)
+    job_runner = JobRunner()
+    job = {"id": "job-1"}
+    claims = []
+
+    async def claim_next_job(lease_seconds):
+        claims.append(lease_seconds)
+        if len(claims) == 1:
+            # A job is enqueued while this claim is still finding nothing
+            job_runner.notify()
+            return None
+        return job
+
+    monkeypatch.setattr(runner, "claim_next_job", claim_next_job)
+
+    async def scenario():
+        ran = asyncio.get_running_loop().create_future()
+
+        async def record(claimed):
+            ran.set_result(claimed)
+            await asyncio.Event().wait()
+
+        job_runner._run = record
+        worker = asyncio.create_task(job_runner._worker(0))
+        try:
+            return await asyncio.wait_for(ran, timeout=1.0)
+        finally:
+            worker.cancel()
+            await asyncio.gather(worker, return_exceptions=True)
+
+    assert asyncio.run(scenario()) is job
@@ -0,0 +1,62 @@
+import cProfile
+import pstats
+
+from app.core.profiling import build_call_tree
+
+
+def _leaf():
+    return sum(i * i for i in range(20000))
+
+
+def _branch():
+    return _leaf() + _leaf()
+
+
+def _profiled_root():
+    return _branch()
+
+
+def _find(nodes, name):
+    for node in nodes:
+        if node["function"].startswith(f"{name} "):
+            return node
+        found = _find(node["children"], name)
+        if found is not None:
+            return found
+    return None
+
+
+def test_build_call_tree_nests_callees_with_edge_counts():
+    profiler = cProfile.Profile()
+    profiler.enable()
+    _profiled_root()
+    profiler.disable()
+
+    tree = build_call_tree(pstats.Stats(profiler))
+
+    root = _find(tree, "_profiled_root")
+    assert root is not None and root["calls"] == 1
+    branch = _find(root["children"], "_branch")
+    assert branch is not None
+    leaf = _find(branch["children"], "_leaf")
+    assert leaf is not None and leaf["calls"] == 2
+    assert leaf["cumulative_ms"] <= branch["cumulative_ms"] <= root["cumulative_ms"]
+
+
+def test_build_call_tree_stops_on_recursion():
+    def recurse(n):
+        return 0 if n == 0 else recurse(n - 1) + sum(range(2000))
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    recurse(50)
+    profiler.disable()
+
+    node = _find(build_call_tree(pstats.Stats(profiler)), "recurse")
+    assert node is not None
+    # The recursive edge appears once and is not expanded again
+    depth = 0
+    while node["children"] and node["children"][0]["function"] == node["function"]:
+        node = node["children"][0]
+        depth += 1
+    assert depth <= 1
@@ -0,0 +1,133 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from app.core import security
+from app.domains.user import repository
+from app.domains.user.models import UserCreate, UserUpdate
+from app.domains.user.repository import DuplicateEmailError, InMemoryUserRepository
+from app.domains.user.service import (
+    EmailAlreadyRegisteredError,
+    UserNotFoundError,
+    fetch_user,
+    register_user,
+    update_user_service,
+)
+
+
+ANN = UserCreate(name="Ann", email="ann@example.com", password="password123")
+
+
+@pytest.fixture
+def repo(monkeypatch):
+    memory = InMemoryUserRepository()
+    monkeypatch.setattr(repository, "_repository", memory)
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)  # keep hashing fast
+    return memory
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks]).decode("utf-8")
+
+
+def test_create_and_lookup_hides_password_by_id(repo):
+    user_id = uuid4()
+    run(repo.create_user(user_id, "Ann", "ann@example.com", "hash"))
+
+    by_id = run(repo.get_user_by_id(user_id))
+    assert by_id["email"] == "ann@example.com"
+    assert "password" not in by_id
+    assert run(repo.get_user_by_email("ann@example.com"))["password"] == "hash"
+    assert run(repo.get_user_by_id_with_password(user_id))["password"] == "hash"
+
+
+def test_create_rejects_duplicate_email(repo):
+    run(repo.create_user(uuid4(), "Ann", "ann@example.com", "hash"))
+    with pytest.raises(DuplicateEmailError):
+        run(repo.create_user(uuid4(), "Other", "ann@example.com", "hash"))
+    assert len(run(repo.get_all_users())) == 1
+
+
+def test_update_email_moves_index(repo):
+    user_id = uuid4()
+    run(repo.create_user(user_id, "Ann", "ann@example.com", "hash"))
+
+    assert run(repo.update_user(user_id, email="new@example.com"))
+    assert run(repo.get_user_by_email("ann@example.com")) is None
+    assert run(repo.get_user_by_email("new@example.com"))["id"] == user_id
+    # The old address is free again
+    run(repo.create_user(uuid4(), "Bob", "ann@example.com", "hash"))
+
+
+def test_update_to_taken_email_is_rejected(repo):
+    ann, bob = uuid4(), uuid4()
+    run(repo.create_user(ann, "Ann", "ann@example.com", "hash"))
+    run(repo.create_user(bob, "Bob", "bob@example.com", "hash"))
+
+    with pytest.raises(DuplicateEmailError):
+        run(repo.update_user(bob, email="ann@example.com"))
+    assert run(repo.get_user_by_email("ann@example.com"))["id"] == ann
+    assert run(repo.get_user_by_email("bob@example.com"))["id"] == bob
+
+
+def test_delete_frees_email(repo):
+    user_id = uuid4()
+    run(repo.create_user(user_id, "Ann", "ann@example.com", "hash"))
+
+    assert run(repo.delete_user_by_id(user_id))
+    assert not run(repo.delete_user_by_id(user_id))
+    assert run(repo.get_user_by_email("ann@example.com")) is None
+    run(repo.create_user(uuid4(), "Ann", "ann@example.com", "hash"))
+
+
+def test_export_filters_by_updated_since(repo):
+    old, new = uuid4(), uuid4()
+    run(repo.create_user(old, "Old", "old@example.com", "hash"))
+    run(repo.create_user(new, "New", "new@example.com", "hash"))
+    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
+    repo._users[old]["updated_at"] = cutoff - timedelta(days=1)
+
+    csv_export = run(_collect(repo.export_users("csv", cutoff)))
+    lines = csv_export.strip().split("\n")
+    assert lines[0] == "id,name,email,created_at,updated_at"
+    assert len(lines) == 2 and "new@example.com" in lines[1]
+
+    # Naive timestamps are treated as UTC
+    ndjson = run(_collect(repo.export_users("ndjson", cutoff.replace(tzinfo=None))))
+    assert ndjson.count("\n") == 1
+    assert "password" not in csv_export + ndjson
+
+
+def test_register_user_and_duplicate(repo):
+    created = run(register_user(ANN))
+    assert created is not None and created.email == "ann@example.com"
+    assert run(fetch_user(created.id)) == created
+
+    with pytest.raises(EmailAlreadyRegisteredError):
+        run(register_user(ANN))
+
+
+def test_register_user_maps_racing_duplicate(repo, monkeypatch):
+    async def no_user(email):
+        return None  # simulate a concurrent signup that committed after the check
+
+    run(repo.create_user(uuid4(), "Ann", "ann@example.com", "hash"))
+    monkeypatch.setattr(repo, "get_user_by_email", no_user)
+    with pytest.raises(EmailAlreadyRegisteredError):
+        run(register_user(ANN))
+
+
+def test_update_user_service(repo):
+    created = run(register_user(ANN))
+
+    assert run(update_user_service(created.id, UserUpdate(name="Annie")))
+    assert run(fetch_user(created.id)).name == "Annie"
+
+    with pytest.raises(UserNotFoundError):
+        run(update_user_service(uuid4(), UserUpdate(name="Nobody")))